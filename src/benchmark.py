@@ -0,0 +1,274 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Numero di persone generate per ciascun livello di scala
+TIERS = {
+    "1k": 1_000,
+    "10k": 10_000,
+    "100k": 100_000,
+    "1M": 1_000_000,
+}
+
+# Stage misurati, nell'ordine della pipeline
+STAGES = [
+    "populate",
+    "load",
+    "reason",
+    "extract_features",
+    "build_dataset",
+    "train_predictive_model",
+    "train_with_grid_search",
+    "pykeen_train_model",
+]
+
+# Moduli che non devono essere importati all'avvio della CLI
+HEAVY_MODULES = ["owlready2", "pandas", "faker", "sklearn", "torch", "pykeen", "matplotlib"]
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_TIERS = ["1k", "10k"]
+DEFAULT_SEED = 42
+BENCHMARK_DIR = os.path.join("data", "benchmark")
+
+
+def _paths(tier, seed, workdir):
+    ontology_path = os.path.abspath(os.path.join(workdir, f"ontology_{tier}_s{seed}.owl"))
+    dataset_path = os.path.abspath(os.path.join(workdir, f"dataset_{tier}_s{seed}.csv"))
+    return ontology_path, dataset_path
+
+
+def _run_stage(stage_name, persons, ontology_path, dataset_path, seed, transe_epochs):
+    """
+    Esegue un singolo stage in un processo dedicato e ne restituisce le metriche.
+    I prerequisiti dello stage (es. load prima di reason) vengono eseguiti
+    fuori dalla misura, così durata e crescita della memoria riguardano solo lo stage.
+    """
+    from owl import profiler
+    from owl.ontology_manager import OntologyManager
+
+    manager = OntologyManager(ontology_path, dataset_path)
+
+    if stage_name == "populate":
+        run = lambda: manager.populate(num_persons=persons, seed=seed)
+    elif stage_name == "load":
+        run = manager.load
+    elif stage_name == "reason":
+        manager.load()
+        run = manager.reason
+    elif stage_name == "extract_features":
+        run = manager.extract_features
+    elif stage_name == "build_dataset":
+        manager.extract_features()
+        run = manager.build_dataset
+    elif stage_name == "train_predictive_model":
+        from predictive_model.predictive_model import train_predictive_model
+        run = lambda: train_predictive_model(dataset_path, random_state=seed)
+    elif stage_name == "train_with_grid_search":
+        from predictive_model.grid_search_model import train_with_grid_search
+        run = lambda: train_with_grid_search(dataset_path, random_state=seed)
+    elif stage_name == "pykeen_train_model":
+        from pykeen_learner.learningKnowledge import pyKeenManager
+        run = lambda: pyKeenManager(manager).train_model(num_epochs=transe_epochs)
+    else:
+        raise ValueError(f"Stage sconosciuto: {stage_name}")
+
+    with profiler.stage(f"benchmark.{stage_name}", persons=persons) as record:
+        run()
+
+    duration = record["duration_s"]
+    return {
+        "wall_time_s": duration,
+        "peak_rss_mb": record["peak_rss_mb"],
+        "peak_rss_growth_mb": record["peak_rss_growth_mb"],
+        "children_max_rss_mb": record["children_max_rss_mb"],
+        "throughput_persons_per_s": persons / duration if duration > 0 else None,
+    }
+
+
+def _run_isolated(stage_name, *args):
+    # Un processo nuovo per ogni stage: cache di owlready2 e picco di RSS non si sommano
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(_run_stage, stage_name, *args).result()
+
+
+def run_tier(tier, stages, seed=DEFAULT_SEED, workdir=BENCHMARK_DIR, transe_epochs=100):
+    """
+    Misura gli stage richiesti per un livello di scala e restituisce
+    un dizionario stage -> metriche.
+    Ontologia e dataset vengono rigenerati a ogni esecuzione, fuori dalla misura:
+    file lasciati da esecuzioni precedenti (magari con un'altra versione del
+    codice) non vengono mai riutilizzati.
+    """
+    persons = TIERS[tier]
+    ontology_path, dataset_path = _paths(tier, seed, workdir)
+    args = (persons, ontology_path, dataset_path, seed, transe_epochs)
+    results = {}
+
+    if "populate" not in stages:
+        print(f"[{tier}] Generazione dell'ontologia (non misurata)...")
+        _run_isolated("populate", *args)
+
+    dataset_built = False
+    for stage_name in STAGES:
+        if stage_name not in stages:
+            continue
+        needs_dataset = stage_name in ("train_predictive_model", "train_with_grid_search")
+        if needs_dataset and not dataset_built:
+            print(f"[{tier}] Costruzione del dataset (non misurata)...")
+            _run_isolated("build_dataset", *args)
+            dataset_built = True
+
+        print(f"[{tier}] {stage_name}...")
+        results[stage_name] = _run_isolated(stage_name, *args)
+        # Lo stage build_dataset misurato scrive anche il dataset usato dall'addestramento
+        dataset_built = dataset_built or stage_name == "build_dataset"
+        print(f"[{tier}] {stage_name}: {results[stage_name]['wall_time_s']:.3f}s")
+    return results
+
+
+def measure_cli_startup(repeats=5):
+    """
+    Misura il tempo di avvio della CLI (mediana di `cli.py --help` e
+    `cli.py extract --help`, in millisecondi) e verifica quali moduli pesanti
+    vengono importati al solo import di cli.
+    """
+    cli_path = os.path.join(SRC_DIR, "cli.py")
+    timings = {}
+    for label, cli_args in (("help_ms", ["--help"]), ("extract_help_ms", ["extract", "--help"])):
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, cli_path, *cli_args], check=True, stdout=subprocess.DEVNULL)
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[label] = statistics.median(samples)
+
+    probe = (
+        "import json, sys; sys.path.insert(0, %r); import cli; "
+        "print(json.dumps(sorted(m for m in %r if m in sys.modules)))" % (SRC_DIR, HEAVY_MODULES)
+    )
+    output = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True).stdout
+    timings["heavy_modules"] = json.loads(output.strip().splitlines()[-1])
+    return timings
+
+
+def compare_with_baseline(results, baseline, threshold=0.2, memory_threshold=0.2, min_duration=0.05):
+    """
+    Confronta i risultati con una baseline salvata.
+    Uno stage è in regressione se il tempo supera la baseline di oltre threshold
+    (frazione, es. 0.2 = +20%) oppure se il picco di RSS la supera di oltre
+    memory_threshold. Gli stage più brevi di min_duration secondi in entrambe
+    le misure vengono ignorati per il tempo, perché dominati dal rumore.
+    Restituisce (report testuale, lista delle regressioni).
+    """
+    report = f"{'Tier':<8}{'Stage':<26}{'Baseline (s)':>14}{'Attuale (s)':>14}{'Delta':>10}\n"
+    regressions = []
+    for tier, stages in results["results"].items():
+        for stage_name, current in stages.items():
+            base = baseline.get("results", {}).get(tier, {}).get(stage_name)
+            if base is None:
+                continue
+            delta = current["wall_time_s"] / base["wall_time_s"] - 1 if base["wall_time_s"] > 0 else 0.0
+            flag = ""
+            slow = max(current["wall_time_s"], base["wall_time_s"]) >= min_duration
+            if slow and delta > threshold:
+                regressions.append((tier, stage_name, "wall_time_s", delta))
+                flag = "  REGRESSIONE"
+            if current["peak_rss_mb"] and base["peak_rss_mb"]:
+                mem_delta = current["peak_rss_mb"] / base["peak_rss_mb"] - 1
+                if mem_delta > memory_threshold:
+                    regressions.append((tier, stage_name, "peak_rss_mb", mem_delta))
+                    flag += f"  MEMORIA +{mem_delta:.0%}"
+            report += (f"{tier:<8}{stage_name:<26}{base['wall_time_s']:>14.3f}"
+                       f"{current['wall_time_s']:>14.3f}{delta:>+10.1%}{flag}\n")
+    return report, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark riproducibile della pipeline a diversi livelli di scala"
+    )
+    parser.add_argument("--tiers", nargs="*", choices=list(TIERS), default=DEFAULT_TIERS,
+                        help="Livelli di scala da misurare (default: 1k 10k)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stage da misurare (default: tutti)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seme per la generazione dei dati")
+    parser.add_argument("--workdir", default=BENCHMARK_DIR, help="Cartella per ontologie e dataset generati")
+    parser.add_argument("--transe-epochs", type=int, default=100, help="Epoche di addestramento TransE")
+    parser.add_argument("--output", default=os.path.join(BENCHMARK_DIR, "results.json"),
+                        help="File JSON in cui salvare i risultati")
+    parser.add_argument("--baseline", default=None, help="File JSON di baseline con cui confrontare i risultati")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Aumento relativo del tempo oltre il quale uno stage è in regressione")
+    parser.add_argument("--memory-threshold", type=float, default=0.2,
+                        help="Aumento relativo del picco di RSS oltre il quale uno stage è in regressione")
+    parser.add_argument("--startup-check", action="store_true",
+                        help="Misura anche il tempo di avvio della CLI e verifica che non importi moduli pesanti")
+    parser.add_argument("--startup-budget-ms", type=float, default=300.0,
+                        help="Tempo massimo di avvio della CLI con --startup-check")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Salva i risultati anche come nuova baseline (nel percorso di --baseline)")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        "meta": {
+            "seed": args.seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "transe_epochs": args.transe_epochs,
+        },
+        "results": {},
+    }
+    status = 0
+    if args.startup_check:
+        startup = measure_cli_startup()
+        results["startup"] = startup
+        print(f"Avvio CLI: --help {startup['help_ms']:.0f}ms, extract --help {startup['extract_help_ms']:.0f}ms")
+        if startup["heavy_modules"]:
+            print(f"Moduli pesanti importati all'avvio: {', '.join(startup['heavy_modules'])}")
+            status = 1
+        if max(startup["help_ms"], startup["extract_help_ms"]) > args.startup_budget_ms:
+            print(f"Avvio della CLI oltre il budget di {args.startup_budget_ms:.0f}ms")
+            status = 1
+
+    for tier in args.tiers:
+        results["results"][tier] = run_tier(tier, args.stages, args.seed, args.workdir, args.transe_epochs)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Risultati salvati in {args.output}")
+
+    if args.baseline is None:
+        return status
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline salvata in {args.baseline}")
+        return status
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    report, regressions = compare_with_baseline(results, baseline, args.threshold, args.memory_threshold)
+    print(report)
+    if regressions:
+        print(f"{len(regressions)} regressioni rispetto alla baseline.")
+        return 1
+    print("Nessuna regressione rispetto alla baseline.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
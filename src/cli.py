@@ -1,76 +1,194 @@
 import argparse
 import os
-from predictive_model.predictive_model import train_predictive_model, format_result_predictive
-from predictive_model.grid_search_model import train_with_grid_search, format_result_grid
-from predictive_model.compare_model import compare_models
-from owl.ontology_manager import OntologyManager
-from pykeen_learner.learningKnowledge import pyKeenManager
+from owl import profiler
+
+# Le dipendenze pesanti (owlready2, pandas, scikit-learn, PyKEEN, torch, matplotlib)
+# vengono importate solo all'interno del comando che le usa, così l'avvio
+# della CLI e comandi come --help restano immediati.
 
 ontology_path = os.path.join("data", "ontology.owl")
 dataset_path = os.path.join("data", "dataset.csv")
-onto = OntologyManager(ontology_path, dataset_path)
-
-def cli_main():
+predictions_path = os.path.join("data", "predictions.csv")
+export_dir = os.path.join("data", "export")
+
+# Registro dei comandi: nome -> (help, argomenti, funzione)
+COMMANDS = {}
+
+
+def command(name, help_text, arguments=()):
+    """
+    Decorator che registra un sottocomando della CLI.
+    arguments è una lista di tuple (flag, opzioni) passate a add_argument.
+    """
+    def decorator(func):
+        COMMANDS[name] = (help_text, arguments, func)
+        return func
+    return decorator
+
+
+def ontology_manager():
+    from owl.ontology_manager import OntologyManager
+    return OntologyManager(ontology_path, dataset_path)
+
+
+@command("populate", "Popola l'ontologia con dati generati", arguments=[
+    (("--persons",), dict(type=int, default=1000, help="Numero di persone da generare")),
+    (("--seed",), dict(type=int, default=None, help="Seme per una generazione riproducibile")),
+    (("--workers",), dict(type=int, default=1, help="Processi usati per generare le persone")),
+])
+def populate(args):
+    ontology_manager().populate(num_persons=args.persons, seed=args.seed, workers=args.workers)
+
+
+@command("extract", "Estrae il dataset dall'ontologia", arguments=[
+    (("--workers",), dict(type=int, default=1, help="Processi usati per estrarre le caratteristiche")),
+    (("--no-aggregates",), dict(action="store_true",
+                                help="Non calcola le feature aggregate a livello di corso")),
+])
+def extract(args):
+    onto = ontology_manager()
+    onto.extract_features(workers=args.workers, aggregates=not args.no_aggregates)
+    onto.build_dataset()
+
+
+@command("train", "Addestra il modello predittivo sul dataset", arguments=[
+    (("--incremental",), dict(action="store_true",
+                              help="Addestramento out-of-core: legge il dataset a blocchi con SGD")),
+    (("--chunksize",), dict(type=int, default=10000, help="Righe per blocco in modalità incrementale")),
+    (("--epochs",), dict(type=int, default=5, help="Passate sul dataset in modalità incrementale")),
+    (("--alpha",), dict(type=float, default=1e-4, help="Regolarizzazione L2 di SGD in modalità incrementale")),
+    (("--eta0",), dict(type=float, default=0.05, help="Passo di apprendimento di SGD in modalità incrementale")),
+    (("--no-save",), dict(action="store_true", help="Non salva il modello addestrato")),
+])
+def train(args):
+    from predictive_model.artifacts import save_model_artifact
+
+    print("Addestramento del modello predittivo...")
+    if args.incremental:
+        from predictive_model.incremental_model import train_incremental_model
+        kind = "incremental"
+        model_base, scaler_base, acc, report_base = train_incremental_model(
+            dataset_path, chunksize=args.chunksize, n_epochs=args.epochs, alpha=args.alpha, eta0=args.eta0
+        )
+    else:
+        from predictive_model.predictive_model import train_predictive_model
+        kind = "base"
+        model_base, scaler_base, acc, report_base = train_predictive_model(dataset_path)
+    print(f"Accuratezza: {acc}")
+    print(report_base)
+    print("Modello addestrato e valutato.")
+    if not args.no_save:
+        artifact_dir = save_model_artifact(model_base, scaler_base, dataset_path, kind, metrics={"accuracy": acc})
+        print(f"Modello salvato in {artifact_dir}")
+
+
+@command("grid_search", "Addestra il modello predittivo utilizzando Grid Search con cross-validation", arguments=[
+    (("--no-save",), dict(action="store_true", help="Non salva il modello addestrato")),
+])
+def grid_search(args):
+    from predictive_model.grid_search_model import train_with_grid_search
+    from predictive_model.artifacts import save_model_artifact
+
+    print("Addestramento del modello predittivo con Grid Search...")
+    best_model, outer_scores, outer_reports, mean_acc, std_acc = train_with_grid_search(dataset_path)
+    print("Modello ottimizzato addestrato con successo!")
+    if not args.no_save:
+        # La pipeline include già lo scaler
+        artifact_dir = save_model_artifact(best_model, None, dataset_path, "grid_search",
+                                           metrics={"nested_cv_mean_accuracy": mean_acc,
+                                                    "nested_cv_std_accuracy": std_acc})
+        print(f"Modello salvato in {artifact_dir}")
+
+
+@command("predict", "Applica un modello salvato a un dataset, a blocchi", arguments=[
+    (("--model",), dict(default="base",
+                        help="Cartella di un artefatto o tipo di modello (base, grid_search, incremental)")),
+    (("--input",), dict(default=dataset_path, help="Dataset CSV da classificare")),
+    (("--output",), dict(default=predictions_path, help="CSV in cui scrivere predizioni e probabilità")),
+    (("--chunksize",), dict(type=int, default=50000, help="Righe per blocco")),
+])
+def predict(args):
+    from predictive_model.artifacts import predict_dataset
+
+    print(f"Predizione con il modello '{args.model}'...")
+    rows = predict_dataset(args.model, args.input, args.output, chunksize=args.chunksize)
+    print(f"{rows} righe classificate, risultati salvati in {args.output}")
+
+
+@command("compare_base_grid", "Confronta le prestazioni tra il modello base e quello con Grid Search")
+def compare_base_grid(args):
+    from predictive_model.compare_model import compare_models
+
+    print("Confronto tra il modello base e il modello grid search...")
+    results = compare_models(dataset_path)
+    print(results)
+    print("Confronto completato.")
+
+
+@command("export", "Esporta le triple dell'ontologia in N-Triples compresso e TSV di id interi", arguments=[
+    (("--output-dir",), dict(default=export_dir, help="Cartella in cui scrivere i file esportati")),
+    (("--chunk-size",), dict(type=int, default=100000, help="Righe del TSV scritte per blocco")),
+    (("--no-reason",), dict(action="store_true", help="Esporta solo le triple asserite, senza ragionamento")),
+])
+def export(args):
+    from owl.triple_export import export_triples
+
+    onto = ontology_manager()
+    onto.load()
+    if not args.no_reason:
+        onto.reason()
+    summary = export_triples(onto.ontology, args.output_dir, chunk_size=args.chunk_size)
+    print(f"{summary['triples']} triple esportate ({summary['encoded_triples']} tra individui, "
+          f"{summary['entities']} entità, {summary['relations']} relazioni) in {args.output_dir}")
+
+
+@command("learn_graph", "Addestra il modello utilizzando TransE")
+def learn_graph(args):
+    from pykeen_learner.learningKnowledge import pyKeenManager
+
+    print("Addestramento del modello su un dataset di triple...")
+    pyKeen = pyKeenManager()
+    pyKeen = pyKeen.train_model()
+    pyKeen.show_graphs()
+
+
+def build_parser():
     parser = argparse.ArgumentParser(
         description="Dataset Builder Ontology - Interfaccia a riga di comando"
     )
 
-    subparsers = parser.add_subparsers(dest="command", help="Comandi disponibili")
-
-    # Popolare l'ontologia
-    parser_populate = subparsers.add_parser("populate", help="Popola l'ontologia con dati generati")
-    
-    # Comando per estrarre il dataset
-    parser_extract = subparsers.add_parser("extract", help="Estrae il dataset dall'ontologia")
-    
-    # Comando per addestrare il modello predittivo
-    parser_train = subparsers.add_parser("train", help="Addestra il modello predittivo sul dataset")
-
-    # Comando per addestrare il modello con GridSearchCV
-    parser_grid_search = subparsers.add_parser("grid_search", help="Addestra il modello predittivo utilizzando Grid Search con cross-validation")
-
-    # Comando per confrontare i modelli
-    parser_compare = subparsers.add_parser("compare_base_grid", help="Confronta le prestazioni tra il modello base e quello con Grid Search")
+    parser.add_argument("--profile", action="store_true",
+                        help="Stampa la ripartizione di tempo e memoria per ogni stage della pipeline")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Salva un dump cProfile per ogni stage nella cartella indicata (implica --profile)")
 
-    # Comando per addestrare il modello con TransE
-    parser_compare = subparsers.add_parser("learn_graph", help="Addestra il modello utilizzando TransE")
-
-
-    args = parser.parse_args()
-
-    if args.command == "populate":
-        onto.populate()
-
-    elif args.command == "extract":
-        onto.extract_features()
-        onto.build_dataset()
-
-    elif args.command == "train":
-        print("Addestramento del modello predittivo...")
-        model_base, scaler_base, acc, report_base = train_predictive_model(dataset_path)
-        print(f"Accuratezza: {acc}")
-        print(report_base)
-        print("Modello addestrato e valutato.")
-
-    elif args.command == "grid_search":
-        print("Addestramento del modello predittivo con Grid Search...")
-        train_with_grid_search(dataset_path)
-        print("Modello ottimizzato addestrato con successo!")
-
-    elif args.command == "compare_base_grid":
-        print("Confronto tra il modello base e il modello grid search...")
-        results = compare_models(dataset_path)
-        print(results)
-        print("Confronto completato.")
-
-    elif args.command == "learn_graph":
-        print("Addestramento del modello su un dataset di triple...")
-        pyKeen = pyKeenManager()
-        pyKeen = pyKeen.train_model()
-        pyKeen.show_graphs()
-    
-    else:
-        parser.print_help()
+    subparsers = parser.add_subparsers(dest="command", help="Comandi disponibili")
+    for name, (help_text, arguments, func) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        for flags, options in arguments:
+            subparser.add_argument(*flags, **options)
+        subparser.set_defaults(func=func)
+    return parser
+
+
+def cli_main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.profile_dir:
+        args.profile = True
+        profiler.enable_cprofile(args.profile_dir)
+
+    try:
+        if args.command is None:
+            parser.print_help()
+        else:
+            args.func(args)
+    finally:
+        # La ripartizione viene stampata anche se il comando fallisce
+        if args.profile:
+            print("\nRipartizione per stage:")
+            print(profiler.format_summary())
 
 if __name__ == "__main__":
-    cli_main()
\ No newline at end of file
+    cli_main()
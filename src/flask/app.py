@@ -1,6 +1,6 @@
 import os
 import sys
-from flask import Flask, render_template, redirect, url_for, flash, request
+from flask import Flask, Response, render_template, redirect, url_for, flash, request
 from decorators import error_handler
 from flask_wtf.csrf import CSRFProtect
 from forms import DataSplitForm
@@ -15,11 +15,12 @@ parent_dir = os.path.join(current_dir, "..")
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-from pykeen_learner.learningKnowledge import pyKeenManager
 from owl.ontology_manager import OntologyManager
 from predictive_model.predictive_model import train_predictive_model, format_result_predictive
 from predictive_model.grid_search_model import train_with_grid_search, format_result_grid
 from predictive_model.compare_model import compare_models
+from predictive_model.artifacts import MODEL_KINDS, save_model_artifact, predict_dataset
+from owl import profiler
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"  # Necessario per gestire i messaggi flash
@@ -28,6 +29,7 @@ csrf = CSRFProtect(app)
 ONTOLOGY_PATH = os.path.join("data", "ontology.owl")
 ONTOLOGY_PATH = os.path.abspath(ONTOLOGY_PATH)
 DATASET_PATH = os.path.join("data", "dataset.csv")
+PREDICTIONS_PATH = os.path.join("data", "predictions.csv")
 
 onto = OntologyManager(ONTOLOGY_PATH, DATASET_PATH)
 
@@ -63,7 +65,8 @@ def train():
         test_size = float(form.train_ratio.data)
         model, scaler, acc, report = train_predictive_model(DATASET_PATH, test_size=test_size)
         results = format_result_predictive(acc, report)
-        flash("Modello addestrato con successo!", "success")
+        artifact_dir = save_model_artifact(model, scaler, DATASET_PATH, "base", metrics={"accuracy": acc})
+        flash(f"Modello addestrato con successo e salvato in {artifact_dir}!", "success")
         return render_template("train.html", form=form, report=results)
     return render_template("train.html", form=form)
 
@@ -72,7 +75,10 @@ def train():
 def grid_search():
     best_model, outer_scores, outer_reports, mean_acc, std_acc = train_with_grid_search(DATASET_PATH)
     results = format_result_grid(outer_scores, outer_reports, mean_acc, std_acc)
-    flash("Modello addestrato con Grid Search!", "success")
+    artifact_dir = save_model_artifact(best_model, None, DATASET_PATH, "grid_search",
+                                       metrics={"nested_cv_mean_accuracy": mean_acc,
+                                                "nested_cv_std_accuracy": std_acc})
+    flash(f"Modello addestrato con Grid Search e salvato in {artifact_dir}!", "success")
     return render_template("grid_search.html", report=results)
 
 @app.route("/compare")
@@ -85,6 +91,9 @@ def compare():
 
 @app.route("/plot")
 def plot():
+    # PyKEEN e torch vengono importati solo quando serve addestrare TransE
+    from pykeen_learner.learningKnowledge import pyKeenManager
+
     # Addestra il modello
     manager = pyKeenManager().train_model()
 
@@ -107,6 +116,28 @@ def plot():
     # Passa l'immagine codificata al template
     return render_template("plot.html", image_pca2D=pca2D, image_tsne2D=tsne2D, image_pca3D=pca3D)
 
+@app.route("/predict")
+@error_handler("Errore nella predizione")
+def predict():
+    # Il modello da usare si sceglie con ?model=base|grid_search|incremental
+    # Solo i tipi noti: un percorso arbitrario farebbe deserializzare (joblib) file qualsiasi
+    model = request.args.get("model", "base")
+    if model not in MODEL_KINDS:
+        raise ValueError(f"Tipo di modello non valido: scegliere tra {', '.join(MODEL_KINDS)}.")
+    rows = predict_dataset(model, DATASET_PATH, PREDICTIONS_PATH)
+
+    # Si mostra solo un'anteprima: il file completo resta su disco
+    preview = pd.read_csv(PREDICTIONS_PATH, nrows=100)
+    predictions_html = preview.to_html(classes="table table-striped", index=False)
+
+    flash(f"{rows} righe classificate con il modello '{model}'!", "success")
+    return render_template("predict.html", predictions_html=predictions_html, output_path=PREDICTIONS_PATH)
+
+@app.route("/metrics")
+def metrics():
+    # Istogrammi per stage in formato testuale Prometheus
+    return Response(profiler.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     if not os.path.exists("data"):
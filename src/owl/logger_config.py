@@ -1,7 +1,12 @@
 import logging
 
-def setup_logger(name: str, log_file: str, level=logging.INFO):
-    """Configura un logger che scrive sia su file che sulla console."""
+def setup_logger(name: str, log_file: str, level=logging.INFO,
+                 fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s", console=True):
+    """
+    Configura un logger che scrive su file e, se richiesto, anche sulla console.
+    Il parametro fmt permette di cambiare il formato dei record (es. "%(message)s"
+    per i record strutturati in JSON).
+    """
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -9,7 +14,7 @@ def setup_logger(name: str, log_file: str, level=logging.INFO):
 
     if not logger.handlers:
         # Includiamo data, livello e messaggio
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        formatter = logging.Formatter(fmt)
 
         # Handler per la scrittura su file
         file_handler = logging.FileHandler(log_file)
@@ -18,9 +23,10 @@ def setup_logger(name: str, log_file: str, level=logging.INFO):
         logger.addHandler(file_handler)
 
         # Handler per la console
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        console_handler.setLevel(level)
-        logger.addHandler(console_handler)
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            console_handler.setLevel(level)
+            logger.addHandler(console_handler)
 
     return logger
@@ -1,15 +1,271 @@
+import numpy as np
 import pandas as pd
 import random 
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from faker import Faker
+from scipy import sparse
 from owl.logger_config import setup_logger
-from owlready2 import Thing, DataProperty, ObjectProperty, get_ontology, sync_reasoner
+from owl.profiler import profiled, stage
+from owlready2 import Thing, DataProperty, ObjectProperty, World, get_ontology, sync_reasoner
 
 if not os.path.exists("log"):
     os.makedirs("log", exist_ok=True)
 logger = setup_logger("dataset_generator", "log/dataset_generator.log")
 
 
+def _shard_bounds(total, workers):
+    """
+    Divide l'intervallo [0, total) in al più workers intervalli contigui
+    di dimensione quasi uguale e restituisce la lista delle coppie (inizio, fine).
+    """
+    workers = max(1, min(workers, total))
+    size, extra = divmod(total, workers)
+    bounds = []
+    start = 0
+    for i in range(workers):
+        stop = start + size + (1 if i < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _generate_persons(seed, start, stop, num_courses):
+    """
+    Genera i dati delle persone con id in [start, stop).
+    Ogni persona usa un generatore casuale derivato da (seed, id), quindi il
+    risultato non dipende da come gli id vengono suddivisi tra i processi.
+    Restituisce una lista di dizionari con indici dei corsi al posto degli individui.
+    """
+    fake = Faker("it_IT")
+    records = []
+    for i in range(start, stop):
+        rng = random.Random(f"{seed}-{i}")
+        fake.seed_instance(f"{seed}-{i}")
+        record = {
+            "id": i,
+            "name": fake.name(),
+            "age": fake.random_int(min=18, max=80),
+            "random_noise": rng.uniform(-100, 100),
+            "random_noise1": rng.uniform(-100, 100),
+            "random_noise2": rng.uniform(-100, 100),
+            "random_noise3": rng.uniform(-100, 100),
+            "random_category": rng.choice(["A", "B", "C", "D"]),
+            # Assegna casualmente 1-5 corsi a cui la persona è iscritta
+            "takes": rng.sample(range(num_courses), k=rng.randint(1, 5)),
+            "teaches": None,
+        }
+        # Per una percentuale delle persone, assegna anche un corso da insegnare
+        if rng.random() < 0.01:
+            record["teaches"] = rng.randrange(num_courses)
+        records.append(record)
+    return records
+
+
+def _declare_schema(ontology):
+    """
+    Dichiara nell'ontologia le classi e le proprietà usate dal popolamento.
+    Restituisce le classi (Person, Course).
+    """
+    with ontology:
+        class Person(Thing):
+            pass
+
+        class Course(Thing):
+            pass
+
+        class teaches(ObjectProperty):
+            domain = [Person]
+            range = [Course]
+            
+
+        class takes(ObjectProperty):
+            domain = [Person]
+            range = [Course]
+            
+
+        class has_age(DataProperty):
+            domain = [Person]
+            range = [int]
+            
+
+        class has_name(DataProperty):
+            domain = [Person]
+            range = [str]
+            
+
+        class course_title(DataProperty):
+            domain = [Course]
+            range = [str]
+            
+
+        class course_description(DataProperty):
+            domain = [Course]
+            range = [str]
+            
+        class random_noise(DataProperty):
+            domain = [Person]
+            range = [float]
+        
+        class random_noise1(DataProperty):
+            domain = [Person]
+            range = [float]
+
+        class random_noise2(DataProperty):
+            domain = [Person]
+            range = [float]
+
+        class random_noise3(DataProperty):
+            domain = [Person]
+            range = [float]
+        class random_category(DataProperty):
+            domain = [Person]
+            range = [str]
+    return Person, Course
+
+
+def _create_courses(ontology, Course, num_courses):
+    """
+    Crea gli individui course_1 ... course_<num_courses> e li restituisce in ordine.
+    """
+    courses = []
+    with ontology:
+        for i in range(1, num_courses + 1):
+            title = f"Corso {i}"
+            course = Course(f"course_{i}")
+            course.course_title = [title]
+            course.course_description = [f"Descrizione per {title}"]
+            courses.append(course)
+    return courses
+
+
+def _add_persons(ontology, Person, courses, records):
+    """
+    Crea gli individui Person a partire dai dizionari di _generate_persons
+    e li restituisce.
+    """
+    persons = []
+    with ontology:
+        for record in records:
+            person = Person(f"person_{record['id']}")
+            person.has_name = [record["name"]]
+            person.has_age = [record["age"]]
+            person.random_noise = [record["random_noise"]]
+            person.random_noise1 = [record["random_noise1"]]
+            person.random_noise2 = [record["random_noise2"]]
+            person.random_noise3 = [record["random_noise3"]]
+            person.random_category = [record["random_category"]]
+            person.takes.extend([courses[c] for c in record["takes"]])
+            if record["teaches"] is not None:
+                person.teaches.append(courses[record["teaches"]])
+            persons.append(person)
+    return persons
+
+
+def _populate_shard(base_iri, seed, start, stop, num_courses, shard_path):
+    """
+    Costruisce in un World separato schema, corsi e persone con id in [start, stop)
+    e salva in N-Triples in shard_path solo le triple che hanno per soggetto
+    una di queste persone: schema e corsi sono creati dal processo principale.
+    """
+    world = World()
+    ontology = world.get_ontology(base_iri)
+    Person, Course = _declare_schema(ontology)
+    courses = _create_courses(ontology, Course, num_courses)
+    persons = _add_persons(ontology, Person, courses, _generate_persons(seed, start, stop, num_courses))
+    storids = {person.storid for person in persons}
+    ontology.save(file=shard_path, format="ntriples", filter=lambda graph, s, p, o, d: s in storids)
+
+
+def _person_sort_key(person):
+    # Gli individui generati si chiamano person_<id>: si ordinano per id numerico
+    prefix, _, suffix = person.name.rpartition("_")
+    if prefix == "person" and suffix.isdigit():
+        return (0, int(suffix), person.name)
+    return (1, 0, person.name)
+
+
+def _person_row(person):
+    """
+    Estrae la riga del dataset relativa a una persona.
+    """
+    row = {}
+    row["name"] = person.has_name[0] if hasattr(person, "has_name") and person.has_name else None
+    row["age"] = person.has_age[0] if hasattr(person, "has_age") and person.has_age else None
+    row["random_noise"] = person.random_noise[0] if hasattr(person, "random_noise") and person.random_noise else None
+    row["random_noise1"] = person.random_noise1[0] if hasattr(person, "random_noise1") and person.random_noise1 else None
+    row["random_noise2"] = person.random_noise2[0] if hasattr(person, "random_noise2") and person.random_noise2 else None
+    row["random_noise3"] = person.random_noise3[0] if hasattr(person, "random_noise3") and person.random_noise3 else None
+    row["random_category"] = person.random_category[0] if hasattr(person, "random_category") and person.random_category else None
+    # Estrazione dei corsi seguiti 
+    if hasattr(person, "takes") and person.takes:
+        courses_taken = []
+        for course in person.takes:
+            if hasattr(course, "course_title") and course.course_title:
+                courses_taken.append(course.course_title[0])
+            else:
+                courses_taken.append(course.name)
+        row["courses_taken"] = ", ".join(courses_taken)
+    else:
+        row["courses_taken"] = None
+    
+    # Estrazione dei corsi insegnati
+    if hasattr(person, "teaches") and person.teaches:
+        courses_taught = []
+        for course in person.teaches:
+            if hasattr(course, "course_title") and course.course_title:
+                courses_taught.append(course.course_title[0])
+            else:
+                courses_taught.append(course.name)
+        row["courses_taught"] = ", ".join(courses_taught)
+    else:
+        row["courses_taught"] = None
+    return row
+
+
+class _ShardRouter:
+    """
+    Oggetto file passato a owlready2 come destinazione del salvataggio in N-Triples.
+    owlready2 scrive una tripla per chiamata: se il soggetto è una persona la riga
+    va nel file del suo intervallo, altrimenti (schema, corsi) nel file comune.
+    """
+    def __init__(self, common_file, shard_files, subject_to_shard):
+        self.common_file = common_file
+        self.shard_files = shard_files
+        self.subject_to_shard = subject_to_shard
+
+    def write(self, data):
+        shard = self.subject_to_shard.get(data.split(b" ", 1)[0])
+        if shard is None:
+            self.common_file.write(data)
+        else:
+            self.shard_files[shard].write(data)
+
+
+def _load_ntriples(ontology, paths):
+    """
+    Aggiunge all'ontologia le triple dei file N-Triples indicati, senza
+    cancellare quelle già presenti.
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            ontology.load(fileobj=f, reload=True, delete_existing_triples=False)
+
+
+def _extract_shard(common_path, shard_path, base_iri):
+    """
+    Carica in un World separato le triple comuni (schema e corsi) e quelle delle
+    sole persone dell'intervallo, ed estrae le loro righe nell'ordine per id.
+    """
+    world = World()
+    _load_ntriples(world.get_ontology(base_iri), [common_path, shard_path])
+    Person = world[f"{base_iri}Person"]
+    persons = sorted(Person.instances(), key=_person_sort_key)
+    return [_person_row(person) for person in persons]
+
+
 class OntologyManager:
     def __init__(self, ontology_path, output_path=None):
         """
@@ -21,6 +277,7 @@ class OntologyManager:
         self.output_path = output_path
         self.ontology = None
     
+    @profiled("load")
     def load(self):
 
         """
@@ -49,96 +306,34 @@ class OntologyManager:
                 logger.error(f"Errore durante il caricamento dell'ontologia: {e}", exc_info=True)
                 raise
     
-    def populate(self):
+    @profiled("populate")
+    def populate(self, num_persons=1000, num_courses=50, seed=None, workers=1):
         """
         Popola un'ontologia con dati casuali per scopi dimostrativi.
+        Con seed valorizzato la generazione è riproducibile.
+        Con workers > 1 gli id delle persone vengono suddivisi in intervalli:
+        ogni processo genera e crea le proprie persone in un World separato e
+        le serializza in N-Triples (vedi _populate_sharded). Le triple generate
+        sono identiche a quelle di un'esecuzione con un solo processo.
         """
         logger.info("Popolamento dell'ontologia con dati casuali...")
         try:
             if os.path.exists(self.ontology_path):
                 os.remove(self.ontology_path)
             self.ontology = self.load()
-            with self.ontology:
-                class Person(Thing):
-                    pass
-
-                class Course(Thing):
-                    pass
-
-                class teaches(ObjectProperty):
-                    domain = [Person]
-                    range = [Course]
-                    
-
-                class takes(ObjectProperty):
-                    domain = [Person]
-                    range = [Course]
-                    
-
-                class has_age(DataProperty):
-                    domain = [Person]
-                    range = [int]
-                    
-
-                class has_name(DataProperty):
-                    domain = [Person]
-                    range = [str]
-                    
-
-                class course_title(DataProperty):
-                    domain = [Course]
-                    range = [str]
-                    
-
-                class course_description(DataProperty):
-                    domain = [Course]
-                    range = [str]
-                    
-                class random_noise(DataProperty):
-                    domain = [Person]
-                    range = [float]
-                
-                class random_noise1(DataProperty):
-                    domain = [Person]
-                    range = [float]
-
-                class random_noise2(DataProperty):
-                    domain = [Person]
-                    range = [float]
-
-                class random_noise3(DataProperty):
-                    domain = [Person]
-                    range = [float]
-                class random_category(DataProperty):
-                    domain = [Person]
-                    range = [str]
-
-                # Popolamento dell'ontologia con dati
-                fake = Faker("it_IT")
-                num_courses = 50
-                courses = []
-                for i in range(1, num_courses + 1):
-                    title = f"Corso {i}"
-                    course = Course(f"course_{i}")
-                    course.course_title = [title]
-                    course.course_description = [f"Descrizione per {title}"]
-                    courses.append(course)
-
-                num_persons = 1000
-                for i in range(1, num_persons + 1):
-                    person = Person(f"person_{i}")
-                    person.has_name = [fake.name()]
-                    person.has_age = [fake.random_int(min=18, max=80)]
-                    person.random_noise = [random.uniform(-100, 100)]
-                    person.random_noise1 = [random.uniform(-100, 100)]
-                    person.random_noise2 = [random.uniform(-100, 100)]
-                    person.random_noise3 = [random.uniform(-100, 100)]
-                    person.random_category = [random.choice(["A", "B", "C", "D"])]
-                    # Assegna casualmente 1-5 corsi a cui la persona è iscritta
-                    person.takes.extend(random.sample(courses, k=random.randint(1, 5)))
-                    # Per una percentuale delle persone, assegna anche un corso da insegnare
-                    if random.random() < 0.01:
-                        person.teaches.append(random.choice(courses))
+            Person, Course = _declare_schema(self.ontology)
+
+            # Popolamento dell'ontologia con dati
+            if seed is None:
+                seed = random.randrange(2 ** 32)
+            courses = _create_courses(self.ontology, Course, num_courses)
+
+            shards = [(start + 1, stop + 1) for start, stop in _shard_bounds(num_persons, workers)]
+            if len(shards) > 1:
+                self._populate_sharded(seed, shards, num_courses)
+            else:
+                records = _generate_persons(seed, 1, num_persons + 1, num_courses)
+                _add_persons(self.ontology, Person, courses, records)
             try:
                 self.ontology.save(file=self.ontology_path, format="rdfxml")
                 logger.info(f"Ontologia popolata e salvata in {self.ontology_path}.")
@@ -146,10 +341,37 @@ class OntologyManager:
                 logger.error(f"Errore nel salvataggio dell'ontologia: {e}", exc_info=True)
                 raise
         except Exception as e:
-            logger.error(f"Errore durante il caricamento dell'ontologia: {e}", exc_info=True)
+            # Non si lascia su disco l'ontologia vuota o parziale creata da load()
+            if os.path.exists(self.ontology_path):
+                os.remove(self.ontology_path)
+            logger.error(f"Errore durante il popolamento dell'ontologia: {e}", exc_info=True)
+            raise
 
+    def _populate_sharded(self, seed, shards, num_courses):
+        """
+        Genera le persone in parallelo: ogni processo costruisce in un proprio
+        World le persone del suo intervallo di id e ne salva le triple in un
+        file N-Triples temporaneo, che viene poi caricato nell'ontologia.
+        Caricamento delle triple e salvataggio in RDF/XML restano sequenziali.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"shard_{i}.nt") for i in range(len(shards))]
+            logger.info(f"Generazione delle persone con {len(shards)} processi...")
+            with ProcessPoolExecutor(max_workers=len(shards), mp_context=get_context("spawn")) as executor:
+                list(executor.map(
+                    _populate_shard,
+                    [self.ontology.base_iri] * len(shards),
+                    [seed] * len(shards),
+                    [start for start, _ in shards],
+                    [stop for _, stop in shards],
+                    [num_courses] * len(shards),
+                    paths,
+                ))
+            with stage("populate_merge"):
+                _load_ntriples(self.ontology, paths)
 
-    
+
+    @profiled("reason")
     def reason(self):
         """
         Esegue il ragionamento sull'ontologia (sincronizzazione del ragionatore).
@@ -164,7 +386,8 @@ class OntologyManager:
             logger.error(f"Errore durante il ragionamento: {e}", exc_info=True)
             raise
 
-    def extract_features(self):
+    @profiled("extract_features")
+    def extract_features(self, workers=1, aggregates=True):
         """
         Estrae le informazioni rilevanti dagli individui della classe Person
         presenti nell'ontologia.
@@ -173,6 +396,10 @@ class OntologyManager:
         - Età (has_age)
         - Corsi seguiti (takes)
         - Corsi insegnati (teaches)
+        - Con aggregates=True, le feature aggregate a livello di corso
+          (vedi compute_aggregate_features)
+        Con workers > 1 l'estrazione viene suddivisa per intervalli di id
+        tra più processi (vedi _extract_sharded).
         """
 
         self.ontology = get_ontology("file://" + self.ontology_path).load()
@@ -187,50 +414,125 @@ class OntologyManager:
                 logger.error("Classe Person non trovata nell'ontologia.")
                 raise ValueError("Classe Person non trovata nell'ontologia.")
 
-            persons = list(Person.instances())
+            # Ordine deterministico per id, identico nella modalità a più processi
+            persons = sorted(Person.instances(), key=_person_sort_key)
             logger.info(f"Numero di persone trovate: {len(persons)}")
-            
-            for person in persons:
-                row = {}
-                row["name"] = person.has_name[0] if hasattr(person, "has_name") and person.has_name else None
-                row["age"] = person.has_age[0] if hasattr(person, "has_age") and person.has_age else None
-                row["random_noise"] = person.random_noise[0] if hasattr(person, "random_noise") and person.random_noise else None
-                row["random_noise1"] = person.random_noise1[0] if hasattr(person, "random_noise1") and person.random_noise1 else None
-                row["random_noise2"] = person.random_noise2[0] if hasattr(person, "random_noise2") and person.random_noise2 else None
-                row["random_noise3"] = person.random_noise3[0] if hasattr(person, "random_noise3") and person.random_noise3 else None
-                row["random_category"] = person.random_category[0] if hasattr(person, "random_category") and person.random_category else None
-                # Estrazione dei corsi seguiti 
-                if hasattr(person, "takes") and person.takes:
-                    courses_taken = []
-                    for course in person.takes:
-                        if hasattr(course, "course_title") and course.course_title:
-                            courses_taken.append(course.course_title[0])
-                        else:
-                            courses_taken.append(course.name)
-                    row["courses_taken"] = ", ".join(courses_taken)
-                else:
-                    row["courses_taken"] = None
-                
-                # Estrazione dei corsi insegnati
-                if hasattr(person, "teaches") and person.teaches:
-                    courses_taught = []
-                    for course in person.teaches:
-                        if hasattr(course, "course_title") and course.course_title:
-                            courses_taught.append(course.course_title[0])
-                        else:
-                            courses_taught.append(course.name)
-                    row["courses_taught"] = ", ".join(courses_taught)
-                else:
-                    row["courses_taught"] = None
-                
-                
-                self.data.append(row)
+
+            shards = _shard_bounds(len(persons), workers)
+            if len(shards) > 1:
+                self.data = self._extract_sharded(persons, shards)
+            else:
+                self.data = [_person_row(person) for person in persons]
+
+            if aggregates:
+                columns = self.compute_aggregate_features(persons)
+                for name, values in columns.items():
+                    for row, value in zip(self.data, values.tolist()):
+                        row[name] = value
             
             logger.info("Estrazione dati completata con successo.")
         except Exception as e:
+            # Senza rilanciare, build_dataset scriverebbe un CSV incompleto
+            self.data = []
             logger.error(f"Errore durante l'estrazione delle caratteristiche: {e}", exc_info=True)
-            
+            raise
+
+    @profiled("aggregate_features")
+    def compute_aggregate_features(self, persons):
+        """
+        Calcola feature aggregate a livello di corso per le persone indicate,
+        senza visitare i corsi a partire da ogni persona.
+        In un'unica passata sulle asserzioni takes/teaches si costruiscono le
+        matrici sparse di incidenza persona x corso; le loro somme per colonna
+        sono gli indici inversi corso -> iscritti e corso -> docenti, e le
+        colonne per persona si ottengono con prodotti matrice-vettore.
+        Restituisce un dizionario nome colonna -> array allineato a persons:
+        - taken_course_popularity_mean/max: iscritti ai corsi seguiti
+        - co_enrollment_count: iscrizioni di altre persone ai corsi seguiti
+        - taken_course_teachers: docenti dei corsi seguiti, esclusa la persona stessa
+        """
+        person_index = {person.storid: i for i, person in enumerate(persons)}
+        course_index = {}
+
+        def incidence(prop):
+            rows, cols = [], []
+            if prop is not None:
+                for subject, course in prop.get_relations():
+                    i = person_index.get(subject.storid)
+                    if i is None:
+                        continue
+                    rows.append(i)
+                    cols.append(course_index.setdefault(course.storid, len(course_index)))
+            return rows, cols
+
+        takes_rows, takes_cols = incidence(self.ontology.takes)
+        teaches_rows, teaches_cols = incidence(self.ontology.teaches)
+        shape = (len(persons), len(course_index))
+        if 0 in shape:
+            # Nessuna persona o nessun corso seguito/insegnato: tutte le feature valgono 0
+            return {name: np.zeros(len(persons)) for name in (
+                "taken_course_popularity_mean", "taken_course_popularity_max",
+                "co_enrollment_count", "taken_course_teachers",
+            )}
+        takes = sparse.csr_matrix((np.ones(len(takes_rows)), (takes_rows, takes_cols)), shape=shape)
+        teaches = sparse.csr_matrix((np.ones(len(teaches_rows)), (teaches_rows, teaches_cols)), shape=shape)
+
+        # Indici inversi: numero di iscritti e di docenti per corso
+        takers = np.asarray(takes.sum(axis=0)).ravel()
+        teachers = np.asarray(teaches.sum(axis=0)).ravel()
+
+        num_taken = np.asarray(takes.sum(axis=1)).ravel()
+        popularity_sum = takes @ takers
+        popularity_max = takes.multiply(takers).tocsr().max(axis=1).toarray().ravel()
+        own_teaching = np.asarray(takes.multiply(teaches).sum(axis=1)).ravel()
+
+        return {
+            "taken_course_popularity_mean": np.divide(
+                popularity_sum, num_taken, out=np.zeros(len(persons)), where=num_taken > 0
+            ),
+            "taken_course_popularity_max": popularity_max,
+            "co_enrollment_count": popularity_sum - num_taken,
+            "taken_course_teachers": takes @ teachers - own_teaching,
+        }
+
+    def _extract_sharded(self, persons, shards):
+        """
+        Estrae le righe in parallelo. L'ontologia già ragionata viene salvata una
+        sola volta in N-Triples suddividendo le triple per soggetto (vedi
+        _ShardRouter): un file comune con schema e corsi e un file per ogni
+        intervallo di persone. Ogni processo carica solo il file comune e il
+        proprio, quindi il suo costo è proporzionale alle persone che estrae.
+        I blocchi vengono concatenati nell'ordine degli intervalli.
+        """
+        subject_to_shard = {
+            f"<{person.iri}>".encode("utf8"): i
+            for i, (start, stop) in enumerate(shards)
+            for person in persons[start:stop]
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            common_path = os.path.join(tmp_dir, "common.nt")
+            shard_paths = [os.path.join(tmp_dir, f"shard_{i}.nt") for i in range(len(shards))]
+            with stage("extract_snapshot"):
+                with open(common_path, "wb") as common_file:
+                    shard_files = [open(path, "wb") for path in shard_paths]
+                    try:
+                        # Il ragionamento avviene dentro "with self.ontology", quindi i fatti inferiti sono inclusi
+                        router = _ShardRouter(common_file, shard_files, subject_to_shard)
+                        self.ontology.save(file=router, format="ntriples")
+                    finally:
+                        for f in shard_files:
+                            f.close()
+            logger.info(f"Estrazione con {len(shards)} processi...")
+            with ProcessPoolExecutor(max_workers=len(shards), mp_context=get_context("spawn")) as executor:
+                chunks = executor.map(
+                    _extract_shard,
+                    [common_path] * len(shards),
+                    shard_paths,
+                    [self.ontology.base_iri] * len(shards),
+                )
+                return [row for rows in chunks for row in rows]
 
+    @profiled("build_dataset")
     def build_dataset(self):
         """
         Costruisce un dataset a partire dai dati estratti e lo salva in formato CSV.
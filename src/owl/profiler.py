@@ -0,0 +1,310 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from owl.logger_config import setup_logger
+
+try:
+    import resource
+except ImportError:  # Windows: il modulo resource non è disponibile
+    resource = None
+
+
+# Limiti superiori (in secondi) dei bucket degli istogrammi Prometheus
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}
+_peak_rss = {}
+_children_rss = {}
+_records = deque(maxlen=1000)
+_cprofile_dir = None
+_perf_logger = None
+
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+# Intervallo (in secondi) di campionamento della RSS durante gli stage
+RSS_SAMPLING_INTERVAL = 0.05
+
+
+def current_rss_mb():
+    """
+    Restituisce la memoria residente (RSS) attuale del processo in MB, letta da
+    /proc/self/statm, oppure None se la piattaforma non la espone.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * _PAGE_SIZE / (1024 * 1024)
+
+
+def children_max_rss_mb():
+    """
+    Restituisce in MB il massimo RSS raggiunto dai processi figli terminati
+    finora (RUSAGE_CHILDREN), ad esempio i worker dei ProcessPoolExecutor,
+    oppure None se la piattaforma non lo espone. I figli ancora attivi non
+    sono inclusi, il valore non diminuisce mai e su Linux un figlio creato con
+    fork parte dal picco del processo padre.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Su macOS ru_maxrss è espresso in byte, su Linux in kilobyte
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class _Peak:
+    def __init__(self, value):
+        self.value = value
+
+
+class _RssSampler:
+    """
+    Thread che campiona la RSS del processo finché c'è almeno uno stage attivo
+    e aggiorna il picco di ciascuno stage in corso.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self, peak):
+        with self.lock:
+            self.active.append(peak)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self.thread.start()
+
+    def stop(self, peak):
+        self._sample()
+        with self.lock:
+            self.active.remove(peak)
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is None:
+            return
+        with self.lock:
+            for peak in self.active:
+                if peak.value is None or rss > peak.value:
+                    peak.value = rss
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    self.thread = None
+                    return
+            self._sample()
+
+
+_sampler = _RssSampler(RSS_SAMPLING_INTERVAL)
+
+
+def perf_logger():
+    """
+    Restituisce il logger dei record di performance, creandolo al primo uso:
+    importare il modulo (ad esempio per cli.py --help) non crea log/ né file.
+    """
+    global _perf_logger
+    with _lock:
+        if _perf_logger is None:
+            os.makedirs("log", exist_ok=True)
+            # I record di performance sono righe JSON, una per stage, scritte solo su file
+            _perf_logger = setup_logger("performance", "log/performance.log", fmt="%(message)s", console=False)
+        return _perf_logger
+
+
+def enable_cprofile(directory):
+    """
+    Abilita il salvataggio di un dump cProfile (<stage>.prof) per ogni stage
+    di primo livello nella cartella indicata. Con None il dump viene disabilitato.
+    """
+    global _cprofile_dir
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _cprofile_dir = directory
+
+
+def _observe(record):
+    name = record["stage"]
+    with _lock:
+        histogram = _histograms.setdefault(name, {
+            "buckets": [0] * len(DURATION_BUCKETS),
+            "sum": 0.0,
+            "count": 0,
+        })
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if record["duration_s"] <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += record["duration_s"]
+        histogram["count"] += 1
+        if record["peak_rss_mb"] is not None:
+            _peak_rss[name] = max(_peak_rss.get(name, 0.0), record["peak_rss_mb"])
+        if record["children_max_rss_mb"] is not None:
+            _children_rss[name] = record["children_max_rss_mb"]
+        _records.append(record)
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Misura una fase della pipeline: durata, RSS all'inizio, picco di RSS
+    campionato durante la fase (e quindi la sua crescita) e il massimo RSS dei
+    processi figli terminati (vedi children_max_rss_mb). Alla chiusura il
+    record viene scritto come riga JSON nel log di performance e aggregato
+    negli istogrammi esposti da /metrics.
+    Il dizionario restituito viene completato all'uscita dal blocco.
+    """
+    depth = getattr(_local, "depth", 0)
+    record = {"stage": name, "depth": depth, **labels}
+    profiler = None
+    if _cprofile_dir is not None and depth == 0:
+        # cProfile non supporta profiler annidati: si profila solo lo stage esterno
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    rss_start = current_rss_mb()
+    peak = _Peak(rss_start)
+    _sampler.start(peak)
+    start = time.perf_counter()
+    _local.depth = depth + 1
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _local.depth = depth
+        duration = time.perf_counter() - start
+        _sampler.stop(peak)
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(_cprofile_dir, f"{name}.prof"))
+        record.update({
+            "status": status,
+            "timestamp": time.time(),
+            "duration_s": duration,
+            "rss_start_mb": rss_start,
+            "peak_rss_mb": peak.value,
+            "peak_rss_growth_mb": (peak.value - rss_start) if rss_start is not None else None,
+            "children_max_rss_mb": children_max_rss_mb(),
+        })
+        _observe(record)
+        perf_logger().info(json.dumps(record, default=str))
+
+
+def profiled(name):
+    """
+    Decorator che esegue la funzione decorata all'interno di stage(name).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def records():
+    """Restituisce una copia degli ultimi record di performance raccolti."""
+    with _lock:
+        return list(_records)
+
+
+def last_record(name):
+    """Restituisce l'ultimo record raccolto per lo stage indicato, o None."""
+    with _lock:
+        for record in reversed(_records):
+            if record["stage"] == name:
+                return record
+    return None
+
+
+def reset():
+    """Azzera istogrammi e record raccolti nel processo corrente."""
+    with _lock:
+        _histograms.clear()
+        _peak_rss.clear()
+        _children_rss.clear()
+        _records.clear()
+
+
+def format_summary():
+    """
+    Restituisce una tabella testuale con la ripartizione dei tempi per stage
+    (numero di esecuzioni, tempo totale, tempo medio e picco di RSS campionato).
+    """
+    with _lock:
+        rows = [(name, h["count"], h["sum"], _peak_rss.get(name)) for name, h in _histograms.items()]
+    if not rows:
+        return "Nessuno stage registrato.\n"
+
+    rows.sort(key=lambda row: row[2], reverse=True)
+    result = f"{'Stage':<28}{'Esecuzioni':>12}{'Totale (s)':>14}{'Media (s)':>14}{'Picco RSS (MB)':>18}\n"
+    for name, count, total, rss in rows:
+        rss_str = f"{rss:.1f}" if rss is not None else "n/d"
+        result += f"{name:<28}{count:>12}{total:>14.3f}{total / count:>14.3f}{rss_str:>18}\n"
+    return result
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus():
+    """
+    Restituisce gli istogrammi di durata, il picco di RSS campionato e il
+    massimo RSS dei processi figli terminati per stage nel formato testuale di esposizione di Prometheus (versione 0.0.4).
+    """
+    with _lock:
+        histograms = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()}
+        peaks = dict(_peak_rss)
+        children = dict(_children_rss)
+
+    lines = [
+        "# HELP pipeline_stage_duration_seconds Durata degli stage della pipeline.",
+        "# TYPE pipeline_stage_duration_seconds histogram",
+    ]
+    for name in sorted(histograms):
+        h = histograms[name]
+        label = _escape_label(name)
+        for bound, count in zip(DURATION_BUCKETS, h["buckets"]):
+            lines.append(f'pipeline_stage_duration_seconds_bucket{{stage="{label}",le="{bound}"}} {count}')
+        lines.append(f'pipeline_stage_duration_seconds_bucket{{stage="{label}",le="+Inf"}} {h["count"]}')
+        lines.append(f'pipeline_stage_duration_seconds_sum{{stage="{label}"}} {h["sum"]}')
+        lines.append(f'pipeline_stage_duration_seconds_count{{stage="{label}"}} {h["count"]}')
+
+    lines += [
+        "# HELP pipeline_stage_peak_rss_megabytes Massimo RSS del processo campionato durante lo stage.",
+        "# TYPE pipeline_stage_peak_rss_megabytes gauge",
+    ]
+    for name in sorted(peaks):
+        lines.append(f'pipeline_stage_peak_rss_megabytes{{stage="{_escape_label(name)}"}} {peaks[name]}')
+
+    lines += [
+        "# HELP pipeline_stage_children_max_rss_megabytes Massimo RSS dei processi figli terminati "
+        "alla fine dello stage (RUSAGE_CHILDREN, non decresce).",
+        "# TYPE pipeline_stage_children_max_rss_megabytes gauge",
+    ]
+    for name in sorted(children):
+        lines.append(f'pipeline_stage_children_max_rss_megabytes{{stage="{_escape_label(name)}"}} {children[name]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,134 @@
+import csv
+import gzip
+import os
+from owl.logger_config import setup_logger
+from owl.profiler import profiled
+
+if not os.path.exists("log"):
+    os.makedirs("log", exist_ok=True)
+logger = setup_logger("dataset_generator", "log/dataset_generator.log")
+
+NTRIPLES_FILE = "triples.nt.gz"
+TRIPLES_FILE = "triples.tsv"
+ENTITIES_FILE = "entities.tsv"
+RELATIONS_FILE = "relations.tsv"
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+# Vocabolari dello schema: triple che li usano come relazione o come coda
+# (dichiarazioni di classi e proprietà, domain, range, subClassOf, ...) non
+# descrivono individui e restano fuori dal TSV
+SCHEMA_NAMESPACES = (
+    "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "http://www.w3.org/2000/01/rdf-schema#",
+    "http://www.w3.org/2002/07/owl#",
+    "http://www.w3.org/2001/XMLSchema#",
+)
+
+
+class _TripleExportWriter:
+    """
+    Oggetto file passato a owlready2 come destinazione del salvataggio in N-Triples.
+    Ogni riga ricevuta viene scritta compressa nel file .nt.gz e, se è una tripla
+    tra individui (vedi _is_abox), codificata con gli id interi del vocabolario
+    e accodata al TSV a blocchi di chunk_size righe.
+    """
+    def __init__(self, ntriples_file, tsv_file, chunk_size):
+        self.ntriples_file = ntriples_file
+        self.tsv_file = tsv_file
+        self.chunk_size = chunk_size
+        self.entity_to_id = {}
+        self.relation_to_id = {}
+        self.buffer = []
+        self.num_triples = 0
+        self.num_encoded = 0
+
+    def write(self, data):
+        self.ntriples_file.write(data)
+        for line in data.decode("utf8").splitlines():
+            self._encode(line)
+
+    def _encode(self, line):
+        if not line.startswith(("<", "_:")):
+            return  # es. intestazione VERSION
+        self.num_triples += 1
+        subject, predicate, rest = line.split(" ", 2)
+        obj = rest[:-2].rstrip() if rest.endswith(" .") else rest.rstrip()
+        if not _is_abox(subject, predicate, obj):
+            return
+        head = self.entity_to_id.setdefault(_label(subject), len(self.entity_to_id))
+        relation = self.relation_to_id.setdefault(_label(predicate), len(self.relation_to_id))
+        tail = self.entity_to_id.setdefault(_label(obj), len(self.entity_to_id))
+        self.buffer.append(f"{head}\t{relation}\t{tail}\n")
+        self.num_encoded += 1
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        self.tsv_file.writelines(self.buffer)
+        self.buffer = []
+
+
+def _label(term):
+    # <iri> -> iri, i blank node (_:n) restano invariati
+    return term[1:-1] if term.startswith("<") else term
+
+
+def _is_abox(subject, predicate, obj):
+    """
+    Indica se la tripla lega due individui (es. takes, teaches) o un individuo
+    alla sua classe (rdf:type Person). Sono escluse le triple con letterali o
+    blank node e quelle dello schema, compresa la dichiarazione dell'ontologia
+    <http://anonymous> aggiunta da owlready2 al salvataggio del World.
+    """
+    if not (subject.startswith("<") and obj.startswith("<")):
+        return False
+    predicate, obj = _label(predicate), _label(obj)
+    if obj.startswith(SCHEMA_NAMESPACES):
+        return False
+    return predicate == RDF_TYPE or not predicate.startswith(SCHEMA_NAMESPACES)
+
+
+def _write_vocabulary(path, mapping):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", quoting=csv.QUOTE_NONE, escapechar="\\")
+        for label, index in mapping.items():
+            writer.writerow([index, label])
+
+
+@profiled("export_triples")
+def export_triples(ontology, output_dir, chunk_size=100000):
+    """
+    Esporta le triple asserite e inferite del World dell'ontologia in output_dir:
+    - triples.nt.gz: tutte le triple in N-Triples compresso
+    - triples.tsv: triple tra individui (asserzioni di proprietà e rdf:type verso
+      le classi dell'ontologia, vedi _is_abox) codificate come id interi
+      (testa, relazione, coda); le triple dello schema sono solo nel .nt.gz
+    - entities.tsv, relations.tsv: vocabolari "id<TAB>IRI"
+    Le triple vengono scritte man mano che owlready2 le serializza e il TSV
+    a blocchi di chunk_size righe, quindi in memoria restano solo i vocabolari.
+    Restituisce un dizionario con il numero di triple, entità e relazioni.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    logger.info(f"Esportazione delle triple in {output_dir}...")
+    try:
+        with gzip.open(os.path.join(output_dir, NTRIPLES_FILE), "wb") as ntriples_file, \
+                open(os.path.join(output_dir, TRIPLES_FILE), "w") as tsv_file:
+            writer = _TripleExportWriter(ntriples_file, tsv_file, chunk_size)
+            # Il salvataggio del World include sia le triple asserite sia quelle inferite
+            ontology.world.save(file=writer, format="ntriples")
+            writer.flush()
+
+        _write_vocabulary(os.path.join(output_dir, ENTITIES_FILE), writer.entity_to_id)
+        _write_vocabulary(os.path.join(output_dir, RELATIONS_FILE), writer.relation_to_id)
+    except Exception as e:
+        logger.error(f"Errore durante l'esportazione delle triple: {e}", exc_info=True)
+        raise
+
+    summary = {
+        "triples": writer.num_triples,
+        "encoded_triples": writer.num_encoded,
+        "entities": len(writer.entity_to_id),
+        "relations": len(writer.relation_to_id),
+    }
+    logger.info(f"Esportazione completata: {summary}")
+    return summary
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import time
+import joblib
+import pandas as pd
+import sklearn
+from owl.profiler import profiled
+from predictive_model.features import build_features
+
+MODELS_DIR = os.path.join("data", "models")
+# Tipi di modello salvati dalla CLI e dall'applicazione web
+MODEL_KINDS = ("base", "grid_search", "incremental")
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def dataset_hash(dataset_path, block_size=1 << 20):
+    """Calcola lo SHA-256 del dataset leggendolo a blocchi."""
+    sha = hashlib.sha256()
+    with open(dataset_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _versions(kind_dir):
+    if not os.path.isdir(kind_dir):
+        return []
+    return sorted(int(name[1:]) for name in os.listdir(kind_dir) if name.startswith("v") and name[1:].isdigit())
+
+
+def save_model_artifact(model, scaler, dataset_path, kind, metrics=None,
+                        feature_columns=None, models_dir=MODELS_DIR):
+    """
+    Salva modello e scaler come artefatto versionato in <models_dir>/<kind>/v<N>/:
+    - model.joblib: dizionario {"model", "scaler"} (scaler può essere None,
+      ad esempio per la pipeline di Grid Search che lo include già)
+    - metadata.json: schema delle feature, hash del dataset, metriche e versioni.
+    Se feature_columns non è indicato, lo schema è quello che build_features
+    produce per il dataset di addestramento.
+    Restituisce il percorso della cartella dell'artefatto.
+    """
+    if feature_columns is None:
+        feature_columns = build_features(pd.read_csv(dataset_path, nrows=1)).columns
+    kind_dir = os.path.join(models_dir, kind)
+    versions = _versions(kind_dir)
+    version = versions[-1] + 1 if versions else 1
+    artifact_dir = os.path.join(kind_dir, f"v{version}")
+    os.makedirs(artifact_dir)
+
+    joblib.dump({"model": model, "scaler": scaler}, os.path.join(artifact_dir, "model.joblib"))
+    metadata = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "kind": kind,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "dataset_path": os.path.abspath(dataset_path),
+        "dataset_sha256": dataset_hash(dataset_path),
+        "feature_columns": list(feature_columns),
+        "sklearn_version": sklearn.__version__,
+        "metrics": metrics or {},
+    }
+    with open(os.path.join(artifact_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return artifact_dir
+
+
+def resolve_artifact(model, models_dir=MODELS_DIR):
+    """
+    Restituisce la cartella dell'artefatto: model può essere un tipo di modello
+    (uno di MODEL_KINDS), nel qual caso si usa la versione più recente in
+    models_dir, oppure il percorso di una cartella di artefatto.
+    """
+    if model in MODEL_KINDS:
+        kind_dir = os.path.join(models_dir, model)
+        versions = _versions(kind_dir)
+        if not versions:
+            raise FileNotFoundError(f"Nessun modello salvato per '{model}' in {models_dir}.")
+        return os.path.join(kind_dir, f"v{versions[-1]}")
+    if os.path.isfile(os.path.join(model, "metadata.json")):
+        return model
+    raise FileNotFoundError(
+        f"'{model}' non è un tipo di modello ({', '.join(MODEL_KINDS)}) né la cartella di un artefatto."
+    )
+
+
+def load_model_artifact(model, models_dir=MODELS_DIR):
+    """
+    Carica un artefatto salvato con save_model_artifact.
+    Restituisce una tupla (modello, scaler, metadata).
+    """
+    artifact_dir = resolve_artifact(model, models_dir)
+    with open(os.path.join(artifact_dir, "metadata.json")) as f:
+        metadata = json.load(f)
+    if metadata.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Formato dell'artefatto non supportato: {metadata.get('format_version')}")
+    payload = joblib.load(os.path.join(artifact_dir, "model.joblib"))
+    return payload["model"], payload["scaler"], metadata
+
+
+def _as_input(estimator, X):
+    # Gli stimatori addestrati su un DataFrame ricevono un DataFrame, gli altri un array
+    return X if hasattr(estimator, "feature_names_in_") else X.to_numpy(dtype=float)
+
+
+@profiled("predict_dataset")
+def predict_dataset(model, input_path, output_path, chunksize=50000, models_dir=MODELS_DIR):
+    """
+    Applica un modello salvato a un dataset leggendolo a blocchi di chunksize righe.
+    Per ogni blocco le feature vengono costruite secondo lo schema dell'artefatto,
+    e predizioni e probabilità della classe 'teacher' vengono aggiunte al CSV di
+    output man mano, senza tenere in memoria l'intero dataset.
+    Il CSV di output viene sempre riscritto, con la sola intestazione se il
+    dataset non ha righe.
+    Restituisce il numero di righe elaborate.
+    """
+    estimator, scaler, metadata = load_model_artifact(model, models_dir)
+    columns = metadata["feature_columns"]
+
+    rows = 0
+    header = ["prediction", "probability"]
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        if chunk.empty:
+            # Un CSV con la sola intestazione produce un unico blocco vuoto
+            if "name" in chunk.columns:
+                header = ["name"] + header
+            continue
+        X = build_features(chunk)
+        missing = [column for column in columns if column not in X.columns]
+        if missing:
+            raise ValueError(f"Il dataset non contiene le feature richieste dal modello: {', '.join(missing)}")
+        X = X[columns]
+        if scaler is not None:
+            X = pd.DataFrame(scaler.transform(_as_input(scaler, X)), columns=columns, index=X.index)
+        X = _as_input(estimator, X)
+
+        result = pd.DataFrame(index=chunk.index)
+        if "name" in chunk.columns:
+            result["name"] = chunk["name"]
+        result["prediction"] = estimator.predict(X)
+        result["probability"] = estimator.predict_proba(X)[:, 1]
+        result.to_csv(output_path, mode="w" if rows == 0 else "a", header=rows == 0, index=False)
+        rows += len(chunk)
+
+    if rows == 0:
+        # Nessuna riga: si tronca comunque l'output, per non lasciare le predizioni di un'esecuzione precedente
+        pd.DataFrame(columns=header).to_csv(output_path, index=False)
+    return rows
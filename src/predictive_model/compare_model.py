@@ -12,8 +12,8 @@ def compare_models(dataset_path, random_state=42):
     model_base, scaler_base, acc_base, report_base = train_predictive_model(dataset_path)
     result_base = format_result_predictive(acc_base, report_base)
     
-    # Addestramento modello con GridSearchCV
-    model_grid, outer_scores, outer_reports, mean_acc, std_acc = train_with_grid_search(dataset_path)
+    # Addestramento modello con GridSearchCV: per il confronto bastano le metriche dei fold
+    _, outer_scores, outer_reports, mean_acc, std_acc = train_with_grid_search(dataset_path, refit=False)
     result_grid = format_result_grid(outer_scores, outer_reports, mean_acc, std_acc)
     
     result = result_base + "\n\n" + result_grid
@@ -0,0 +1,50 @@
+import pandas as pd
+
+# Categorie possibili di 'random_category': fissarle garantisce le stesse
+# colonne dummy anche quando un blocco del dataset non le contiene tutte.
+CATEGORIES = ["A", "B", "C", "D"]
+
+BASE_FEATURES = ['age', 'num_courses_taken', 'age_squared', 'age_interaction',
+                 'random_noise', 'random_noise1', 'random_noise2', 'random_noise3']
+CATEGORY_FEATURES = [f"cat_{category}" for category in CATEGORIES]
+FEATURE_COLUMNS = BASE_FEATURES + CATEGORY_FEATURES
+
+# Feature aggregate a livello di corso, presenti se il dataset è stato estratto
+# con OntologyManager.extract_features(aggregates=True)
+AGGREGATE_FEATURES = ['taken_course_popularity_mean', 'taken_course_popularity_max',
+                      'co_enrollment_count', 'taken_course_teachers']
+
+
+def build_target(df):
+    """
+    Crea il target 'teacher': 1 se 'courses_taught' è valorizzata, 0 altrimenti.
+    """
+    taught = df['courses_taught'].fillna("").astype(str).str.strip()
+    return (taught != "").astype(int)
+
+
+def build_features(df):
+    """
+    Costruisce la matrice delle feature con operazioni vettoriali sulle colonne,
+    così da poter essere applicata anche a singoli blocchi del dataset.
+    Le colonne restituite sono FEATURE_COLUMNS, nello stesso ordine, seguite
+    dalle AGGREGATE_FEATURES presenti nel dataset.
+    """
+    taken = df['courses_taken'].fillna("").astype(str).str.strip()
+    X = pd.DataFrame(index=df.index)
+    X['age'] = df['age'].astype(float)
+    X['num_courses_taken'] = (taken.str.count(",") + 1).where(taken != "", 0)
+
+    # Feature non lineari
+    X['age_squared'] = X['age'] ** 2
+    X['age_interaction'] = X['age'] * X['num_courses_taken']
+
+    for column in ['random_noise', 'random_noise1', 'random_noise2', 'random_noise3']:
+        X[column] = df[column].astype(float)
+
+    categories = pd.Categorical(df['random_category'], categories=CATEGORIES)
+    dummies = pd.get_dummies(categories, prefix='cat', dtype=float)
+    dummies.index = df.index
+    aggregates = [column for column in AGGREGATE_FEATURES if column in df.columns]
+    X = pd.concat([X, dummies, df[aggregates].astype(float)], axis=1)
+    return X[FEATURE_COLUMNS + aggregates]
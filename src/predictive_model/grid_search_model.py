@@ -5,8 +5,21 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
+from owl.profiler import profiled, stage
+from predictive_model.features import build_features, build_target
 
-def train_with_grid_search(dataset_path, random_state=42):
+def _grid_search(pipeline, param_grid, inner_cv):
+    return GridSearchCV(
+        estimator=pipeline,
+        param_grid=param_grid,
+        cv=inner_cv,
+        scoring='balanced_accuracy',
+        n_jobs=-1
+    )
+
+
+@profiled("train_with_grid_search")
+def train_with_grid_search(dataset_path, random_state=42, refit=True):
     """
     Carica il dataset, estrae le feature e il target, e utilizza GridSearchCV
     con 5-fold cross-validation per ottimizzare i parametri del modello di
@@ -22,37 +35,25 @@ def train_with_grid_search(dataset_path, random_state=42):
     Args:
         dataset_path (str): percorso del file CSV contenente il dataset.
         random_state (int): seme per la riproducibilità.
+        refit (bool): se addestrare il modello finale sull'intero dataset.
     
+    La nested cross-validation (5 fold esterni, 3 interni) stima l'accuratezza
+    della procedura; il modello restituito è invece ottenuto ripetendo la
+    Grid Search sull'intero dataset. Con refit=False questo passo viene
+    saltato (ad esempio se interessano solo le metriche) e il modello è None.
+
     Returns:
-        best_estimator: il miglior modello addestrato.
+        best_estimator: il miglior modello della Grid Search sull'intero dataset
+            (None con refit=False).
+        outer_scores, outer_reports: accuratezza e report di ciascun fold esterno.
+        mean_acc, std_acc: media e deviazione standard dell'accuratezza nei fold esterni.
     """
     
     df = pd.read_csv(dataset_path)
-    
-    df['teacher'] = df['courses_taught'].apply(
-        lambda x: 0 if pd.isna(x) or x.strip() == "" else 1
-    )
-    
-    df['num_courses_taken'] = df['courses_taken'].apply(
-        lambda x: len(x.split(',')) if pd.notna(x) and x.strip() != "" else 0
-    )
-    
-    df['random_noise'] = df['random_noise'].apply(lambda x: float(x))
-    df['random_noise1'] = df['random_noise1'].apply(lambda x: float(x))
-    df['random_noise2'] = df['random_noise2'].apply(lambda x: float(x))
-    df['random_noise3'] = df['random_noise3'].apply(lambda x: float(x))
-
-    # Feature non lineari
-    df['age_squared'] = df['age'] ** 2
-    df['age_interaction'] = df['age'] * df['num_courses_taken']
 
-    random_category_dummies = pd.get_dummies(df['random_category'], prefix='cat')
-
-    # Seleziona le feature e il target
-    X = df[['age', 'num_courses_taken', 'age_squared', 'age_interaction',
-            'random_noise', 'random_noise1', 'random_noise2', 'random_noise3']]
-    X = pd.concat([X, random_category_dummies], axis=1)
-    y = df['teacher']
+    # Target 'teacher' e feature (vedi features.py)
+    X = build_features(df)
+    y = build_target(df)
 
     outer_cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
 
@@ -91,18 +92,11 @@ def train_with_grid_search(dataset_path, random_state=42):
         y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
     
 
-        grid_search = GridSearchCV(
-            estimator=pipeline,
-            param_grid=param_grid,
-            cv=inner_cv,
-            scoring='balanced_accuracy',
-            n_jobs=-1
-        )
+        grid_search = _grid_search(pipeline, param_grid, inner_cv)
         
-        grid_search.fit(X_train, y_train)
-        best_model = grid_search.best_estimator_
-        
-        y_pred = best_model.predict(X_test)
+        with stage("grid_search_fold", fold=fold):
+            grid_search.fit(X_train, y_train)
+        y_pred = grid_search.best_estimator_.predict(X_test)
 
         acc = accuracy_score(y_test, y_pred)
         outer_scores.append(acc)
@@ -112,6 +106,14 @@ def train_with_grid_search(dataset_path, random_state=42):
     
     mean_acc = np.mean(outer_scores)
     std_acc = np.std(outer_scores)
+
+    # Il modello finale usa tutti i dati, non solo i 4/5 dell'ultimo fold esterno
+    best_model = None
+    if refit:
+        grid_search = _grid_search(pipeline, param_grid, inner_cv)
+        with stage("grid_search_refit"):
+            grid_search.fit(X, y)
+        best_model = grid_search.best_estimator_
     
 
     return best_model, outer_scores, outer_reports, mean_acc, std_acc
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+from owl.profiler import profiled, stage
+from predictive_model.features import build_features, build_target
+
+CLASSES = np.array([0, 1])
+
+
+def _report_from_confusion(cm, digits=2):
+    """
+    Restituisce il classification report, nello stesso formato di quello di
+    scikit-learn, calcolato da una matrice di confusione (righe: classi vere).
+    """
+    # Ogni cella (vero, predetto) pesata per il suo conteggio equivale al flusso di test completo
+    true_labels, pred_labels = np.meshgrid(CLASSES, CLASSES, indexing="ij")
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        true_labels.ravel(), pred_labels.ravel(), labels=CLASSES, sample_weight=cm.ravel(), zero_division=0
+    )
+    support = cm.sum(axis=1)
+    total = int(support.sum())
+    weights = support / total
+
+    width = len("weighted avg")
+    row = "{:>%d}  {:>9.%df} {:>9.%df} {:>9.%df} {:>9}\n" % (width, digits, digits, digits)
+    report = "{:>%d}  {:>9} {:>9} {:>9} {:>9}\n\n" % width
+    report = report.format("", "precision", "recall", "f1-score", "support")
+    for label, p, r, f, n in zip(CLASSES, precision, recall, f1, support):
+        report += row.format(str(label), p, r, f, int(n))
+    report += "\n"
+    report += ("{:>%d}  {:>9} {:>9} {:>9.%df} {:>9}\n" % (width, digits)).format(
+        "accuracy", "", "", np.trace(cm) / total, total)
+    report += row.format("macro avg", precision.mean(), recall.mean(), f1.mean(), total)
+    report += row.format("weighted avg", weights @ precision, weights @ recall, weights @ f1, total)
+    return report
+
+
+def _iter_chunks(dataset_path, chunksize, test_size, random_state):
+    """
+    Legge il dataset a blocchi e divide ogni blocco in parte di training e di test.
+    La suddivisione dipende solo dal seme e dall'indice del blocco, quindi è
+    identica a ogni passata sul dataset.
+    """
+    for i, chunk in enumerate(pd.read_csv(dataset_path, chunksize=chunksize)):
+        X = build_features(chunk).to_numpy(dtype=float)
+        y = build_target(chunk).to_numpy()
+        rng = np.random.default_rng([random_state, i])
+        test_mask = rng.random(len(chunk)) < test_size
+        yield X[~test_mask], y[~test_mask], X[test_mask], y[test_mask]
+
+
+@profiled("train_incremental_model")
+def train_incremental_model(dataset_path, test_size=0.7, chunksize=10000, n_epochs=5,
+                            alpha=1e-4, eta0=0.05, random_state=42):
+    """
+    Addestra il modello predittivo in modalità out-of-core: il dataset viene letto
+    a blocchi di chunksize righe, quindi la memoria dipende dalla dimensione del
+    blocco e non da quella del dataset.
+
+    - Prima passata: StandardScaler.partial_fit e conteggio delle classi,
+      da cui si ricavano i pesi 'balanced' (non supportati da partial_fit).
+    - n_epochs passate: SGDClassifier con loss logistica e partial_fit, passo
+      costante eta0 e media dei pesi (averaged SGD): con pesi delle classi molto
+      sbilanciati il passo 'optimal' di default fa divergere l'intercetta.
+      alpha è il coefficiente di regolarizzazione L2.
+    - Valutazione sul flusso di test tenuto da parte, accumulando solo la
+      matrice di confusione 2x2 blocco per blocco.
+
+    Restituisce una tupla (modello, scaler, accuracy, classification report),
+    come train_predictive_model.
+    """
+    scaler = StandardScaler()
+    class_counts = np.zeros(len(CLASSES), dtype=np.int64)
+    with stage("incremental_scaler_pass"):
+        for X_train, y_train, _, _ in _iter_chunks(dataset_path, chunksize, test_size, random_state):
+            if len(y_train) == 0:
+                continue
+            scaler.partial_fit(X_train)
+            class_counts += np.bincount(y_train, minlength=len(CLASSES))
+
+    if class_counts.sum() == 0:
+        raise ValueError("Nessuna riga di training nel dataset.")
+
+    # Stessa formula di class_weight='balanced': n_campioni / (n_classi * conteggio)
+    class_weight = {
+        int(c): (class_counts.sum() / (len(CLASSES) * count)) if count > 0 else 1.0
+        for c, count in zip(CLASSES, class_counts)
+    }
+    model = SGDClassifier(loss="log_loss", alpha=alpha, learning_rate="constant", eta0=eta0, average=True,
+                          class_weight=class_weight, random_state=random_state)
+
+    for epoch in range(n_epochs):
+        rng = np.random.default_rng([random_state, epoch])
+        with stage("incremental_epoch", epoch=epoch + 1):
+            for X_train, y_train, _, _ in _iter_chunks(dataset_path, chunksize, test_size, random_state):
+                if len(y_train) == 0:
+                    continue
+                order = rng.permutation(len(y_train))
+                model.partial_fit(scaler.transform(X_train[order]), y_train[order], classes=CLASSES)
+
+    cm = np.zeros((len(CLASSES), len(CLASSES)), dtype=np.int64)
+    with stage("incremental_evaluation"):
+        for _, _, X_test, y_test in _iter_chunks(dataset_path, chunksize, test_size, random_state):
+            if len(y_test) == 0:
+                continue
+            y_pred = model.predict(scaler.transform(X_test))
+            cm += confusion_matrix(y_test, y_pred, labels=CLASSES)
+
+    if cm.sum() == 0:
+        raise ValueError("Nessuna riga di test nel dataset: aumentare test_size.")
+    acc = np.trace(cm) / cm.sum()
+    report = _report_from_confusion(cm)
+
+    return model, scaler, acc, report
@@ -1,9 +1,11 @@
+import csv
 import os
 import sys
 import numpy as np
+import pandas as pd
+import torch
 from pykeen.pipeline import pipeline
 from pykeen.triples import TriplesFactory
-from owlready2 import *
 import matplotlib.pyplot as plt
 from sklearn.decomposition import PCA
 from sklearn.manifold import TSNE
@@ -15,14 +17,35 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 from owl.ontology_manager import OntologyManager
+from owl.profiler import profiled, stage
 
 ONTOLOGY_PATH = os.path.join(parent_dir, "..", "data", "ontology.owl")
 ONTOLOGY_PATH = os.path.abspath(ONTOLOGY_PATH)
 
-onto = OntologyManager(ONTOLOGY_PATH)
+def load_exported_triples(export_dir):
+    """
+    Crea una TriplesFactory di PyKEEN dai file prodotti da owl.triple_export
+    (triples.tsv con le triple tra individui codificate come id interi,
+    entities.tsv e relations.tsv come vocabolari), senza dover ricodificare
+    le etichette.
+    """
+    def read_vocabulary(file_name):
+        vocabulary = pd.read_csv(os.path.join(export_dir, file_name), sep="\t", header=None,
+                                 names=["id", "label"], quoting=csv.QUOTE_NONE, escapechar="\\")
+        return dict(zip(vocabulary["label"], vocabulary["id"]))
+
+    mapped = pd.read_csv(os.path.join(export_dir, "triples.tsv"), sep="\t", header=None, dtype="int64")
+    return TriplesFactory(
+        mapped_triples=torch.as_tensor(mapped.to_numpy()),
+        entity_to_id=read_vocabulary("entities.tsv"),
+        relation_to_id=read_vocabulary("relations.tsv"),
+    )
+
 
 class pyKeenManager:
-    def __init__(self):
+    def __init__(self, ontology_manager=None):
+        # Se non indicato si usa l'ontologia di default in data/ontology.owl
+        self.onto = ontology_manager if ontology_manager is not None else OntologyManager(ONTOLOGY_PATH)
         self.ontology = None
         self.triples = None
         self.has_name_triples = None
@@ -30,11 +53,12 @@ class pyKeenManager:
         self.embeddings = None
 
     
+    @profiled("extract_triples")
     def extract_triples(self):
-        onto.load()
+        self.onto.load()
         self.triples = []
         try:
-            Person = onto.ontology.Person
+            Person = self.onto.ontology.Person
         except AttributeError:
             raise ValueError("La classe 'Person' non è definita nell'ontologia.")
 
@@ -50,7 +74,7 @@ class pyKeenManager:
     def extract_has_name(self):
         self.has_name_triples = []
         try:
-            Person = onto.ontology.Person
+            Person = self.onto.ontology.Person
         except AttributeError:
             raise ValueError("La classe 'Person' non è definita nell'ontologia.")
         
@@ -68,7 +92,8 @@ class pyKeenManager:
                 return label
         return
 
-    def train_model(self):
+    @profiled("train_model")
+    def train_model(self, num_epochs=100):
         self.extract_triples()
         self.extract_has_name()
         triples_array = np.array(self.triples)
@@ -78,13 +103,14 @@ class pyKeenManager:
 
         tf_train, tf_test, tf_valid = tf.split([0.8, 0.1, 0.1])
 
-        result = pipeline(
-            training=tf_train,
-            testing=tf_test,
-            validation=tf_valid,
-            model="TransE",
-            training_kwargs=dict(num_epochs=100),
-        )
+        with stage("transe_training"):
+            result = pipeline(
+                training=tf_train,
+                testing=tf_test,
+                validation=tf_valid,
+                model="TransE",
+                training_kwargs=dict(num_epochs=num_epochs),
+            )
         print(result)
 
         entity_embedding = result.model.entity_representations[0]